@@ -1,5 +1,7 @@
 
 class Node:
+    __slots__ = ("token",)
+
     def __init__(self, token):
         self.token = token
 
@@ -8,16 +10,22 @@ class Node:
 
 
 class Statement(Node):
+    __slots__ = ()
+
     def __init__(self, token):
         super().__init__(token)
 
 
 class Expression(Node):
+    __slots__ = ()
+
     def __init__(self, token):
         super().__init__(token)
 
 
 class Program(Node):
+    __slots__ = ("statements",)
+
     def __init__(self):
         super().__init__("")
         self.statements = []
@@ -33,37 +41,52 @@ class Program(Node):
 
 
 class Identifier(Expression):
+    __slots__ = ("value", "depth", "slot")
+
     def __init__(self, token):
         super().__init__(token)
         self.value = token.literal
+        self.depth = None
+        self.slot = None
 
     def __str__(self):
         return self.value
 
 
 class IntegerLiteral(Expression):
+    __slots__ = ("value", "constant")
+
     def __init__(self, token):
         super().__init__(token)
         self.value = None
+        self.constant = None
 
     def __str__(self):
         return self.token.literal
 
 
 class BooleanLiteral(Expression):
+    __slots__ = ("value", "constant")
+
     def __init__(self, token):
         super().__init__(token)
         self.value = None
+        self.constant = None
 
     def __str__(self):
         return self.token.literal
 
 
 class FunctionLiteral(Expression):
+    __slots__ = ("parameters", "body", "scope", "pure", "self_slot")
+
     def __init__(self, token):
         super().__init__(token)
         self.parameters = []
         self.body = None
+        self.scope = None
+        self.pure = False
+        self.self_slot = None
 
     def __str__(self):
         s = self.token_literal()
@@ -75,21 +98,27 @@ class FunctionLiteral(Expression):
 
 
 class PrefixExpression(Expression):
+    __slots__ = ("operator", "right", "constant")
+
     def __init__(self, token):
         super().__init__(token)
         self.operator = self.token_literal()
         self.right = None
+        self.constant = None
 
     def __str__(self):
         return f"({str(self.operator)}{self.right})"
 
 
 class InfixExpression(Expression):
+    __slots__ = ("left", "operator", "right", "constant")
+
     def __init__(self, token):
         super().__init__(token)
         self.left = None
         self.operator = None
         self.right = None
+        self.constant = None
 
     def __str__(self):
         s = "("
@@ -101,6 +130,8 @@ class InfixExpression(Expression):
 
 
 class IfExpression(Expression):
+    __slots__ = ("condition", "consequence", "alternative")
+
     def __init__(self, token):
         super().__init__(token)
         self.condition = None
@@ -121,10 +152,13 @@ class IfExpression(Expression):
 
 
 class CallExpression(Expression):
+    __slots__ = ("function", "arguments", "tail")
+
     def __init__(self, token):
         super().__init__(token)
         self.function = None
         self.arguments = []
+        self.tail = False
 
     def __str__(self):
         s = str(self.function)
@@ -135,6 +169,8 @@ class CallExpression(Expression):
 
 
 class LetStatement(Statement):
+    __slots__ = ("name", "value")
+
     def __init__(self, token):
         super().__init__(token)
         self.name = None
@@ -149,6 +185,8 @@ class LetStatement(Statement):
 
 
 class ReturnStatement(Statement):
+    __slots__ = ("return_value",)
+
     def __init__(self, token):
         super().__init__(token)
         self.return_value = None
@@ -162,6 +200,8 @@ class ReturnStatement(Statement):
 
 
 class ExpressionStatement(Statement):
+    __slots__ = ("expression",)
+
     def __init__(self, token):
         super().__init__(token)
         self.expression = None
@@ -174,6 +214,8 @@ class ExpressionStatement(Statement):
 
 
 class BlockStatement(Statement):
+    __slots__ = ("statements",)
+
     def __init__(self, token):
         super().__init__(token)
         self.statements = []
@@ -0,0 +1,75 @@
+LOAD_CONST = 0
+LOAD_TRUE = 1
+LOAD_FALSE = 2
+LOAD_NULL = 3
+POP = 4
+
+ADD = 5
+SUB = 6
+MUL = 7
+DIV = 8
+LT = 9
+GT = 10
+EQ = 11
+NEQ = 12
+NEG = 13
+BANG = 14
+
+JUMP = 15
+JUMP_IF_FALSE = 16
+
+GET_LOCAL = 17
+SET_LOCAL = 18
+
+MAKE_FUNCTION = 19
+CALL = 20
+RETURN = 21
+TAIL_CALL = 27
+
+# スーパー命令
+ADD_LOCAL_CONST = 22
+SUB_LOCAL_CONST = 23
+LT_LOCAL_CONST_JUMP_IF_FALSE = 24
+LT_LOCALS_JUMP_IF_FALSE = 25
+EXTENDED_ARG = 26
+
+OPERAND_OPCODES = {
+    LOAD_CONST,
+    JUMP,
+    JUMP_IF_FALSE,
+    GET_LOCAL,
+    SET_LOCAL,
+    MAKE_FUNCTION,
+    CALL,
+    TAIL_CALL,
+}
+
+JUMP_OPCODES = {
+    JUMP,
+    JUMP_IF_FALSE,
+    LT_LOCAL_CONST_JUMP_IF_FALSE,
+    LT_LOCALS_JUMP_IF_FALSE,
+}
+
+SUPERINSTRUCTIONS = [
+    ((GET_LOCAL, LOAD_CONST, LT, JUMP_IF_FALSE), LT_LOCAL_CONST_JUMP_IF_FALSE),
+    ((GET_LOCAL, GET_LOCAL, LT, JUMP_IF_FALSE), LT_LOCALS_JUMP_IF_FALSE),
+    ((GET_LOCAL, LOAD_CONST, ADD), ADD_LOCAL_CONST),
+    ((GET_LOCAL, LOAD_CONST, SUB), SUB_LOCAL_CONST),
+]
+
+INFIX_OPCODES = {
+    "+": ADD,
+    "-": SUB,
+    "*": MUL,
+    "/": DIV,
+    "<": LT,
+    ">": GT,
+    "==": EQ,
+    "!=": NEQ,
+}
+
+PREFIX_OPCODES = {
+    "-": NEG,
+    "!": BANG,
+}
@@ -0,0 +1,224 @@
+from array import array
+import pmonkey.ast as ast
+import pmonkey.code as code
+from pmonkey.resolver import resolve_program
+from pmonkey.objects import Integer
+from pmonkey.objects import TRUE
+from pmonkey.objects import make_int
+from pmonkey.evaluator import fold_constants
+
+
+class Bytecode:
+    def __init__(self):
+        self.instructions = []
+        self.opcodes = b""
+        self.operands = array("q")
+        self.constants = []
+        self.names = []
+        self.bindings = []
+        self.int_program = None
+
+    def assemble(self):
+        instructions = self.fuse_instructions()
+
+        offsets = {}
+        offset = 0
+        for position, op, args in instructions:
+            offsets[position] = offset
+            offset += max(1, len(args))
+        offsets[len(self.instructions)] = offset
+
+        opcodes = bytearray()
+        operands = array("q")
+        for position, op, args in instructions:
+            if op in code.JUMP_OPCODES:
+                args = args[:-1] + (offsets[args[-1]],)
+
+            opcodes.append(op)
+            operands.append(args[0] if args else 0)
+            for extra in args[1:]:
+                opcodes.append(code.EXTENDED_ARG)
+                operands.append(extra)
+
+        self.opcodes = bytes(opcodes)
+        self.operands = operands
+        return self
+
+    def fuse_instructions(self):
+        instructions = self.instructions
+        targets = {arg for op, arg in instructions if op in code.JUMP_OPCODES}
+
+        fused = []
+        i = 0
+        while i < len(instructions):
+            for pattern, super_op in code.SUPERINSTRUCTIONS:
+                window = instructions[i:i + len(pattern)]
+                if tuple(op for op, _ in window) != pattern:
+                    continue
+                if any(j in targets for j in range(i + 1, i + len(pattern))):
+                    continue
+
+                args = tuple(arg for op, arg in window if op in code.OPERAND_OPCODES)
+                fused.append((i, super_op, args))
+                i += len(pattern)
+                break
+            else:
+                op, arg = instructions[i]
+                args = (arg,) if op in code.OPERAND_OPCODES else ()
+                fused.append((i, op, args))
+                i += 1
+
+        return fused
+
+
+class CompiledFunction:
+    def __init__(self, parameters, body, scope, bytecode):
+        self.parameters = parameters
+        self.body = body
+        self.scope = scope
+        self.bytecode = bytecode
+
+
+class Compiler:
+    def __init__(self):
+        self.bytecode = Bytecode()
+        self.__constant_indexes = {}
+        self.__name_indexes = {}
+
+    def emit(self, op, arg=0):
+        self.bytecode.instructions.append((op, arg))
+        return len(self.bytecode.instructions) - 1
+
+    def patch(self, position, arg):
+        op, _ = self.bytecode.instructions[position]
+        self.bytecode.instructions[position] = (op, arg)
+
+    def current_position(self):
+        return len(self.bytecode.instructions)
+
+    def add_constant(self, key, value):
+        if key not in self.__constant_indexes:
+            self.__constant_indexes[key] = len(self.bytecode.constants)
+            self.bytecode.constants.append(value)
+
+        return self.__constant_indexes[key]
+
+    def add_name(self, identifier):
+        # 関数の中では同じ名前は常に同じ (depth, slot) に解決される
+        name = identifier.value
+        if name not in self.__name_indexes:
+            self.__name_indexes[name] = len(self.bytecode.names)
+            self.bytecode.names.append(name)
+            if identifier.depth is None:
+                self.bytecode.bindings.append(None)
+            else:
+                self.bytecode.bindings.append((identifier.depth, identifier.slot))
+
+        return self.__name_indexes[name]
+
+    def compile_program(self, program):
+        self.compile_statements(program.statements)
+        self.emit(code.RETURN)
+        return self.bytecode.assemble()
+
+    def compile_function(self, function):
+        self.compile_statements(function.body.statements)
+        self.emit(code.RETURN)
+        return self.bytecode.assemble()
+
+    def compile_statements(self, statements):
+        if len(statements) == 0:
+            self.emit(code.LOAD_NULL)
+            return
+
+        last = len(statements) - 1
+        for i, statement in enumerate(statements):
+            pushed = self.compile_statement(statement)
+            if i != last and pushed:
+                self.emit(code.POP)
+            elif i == last and not pushed:
+                self.emit(code.LOAD_CONST, self.add_constant(None, None))
+
+    def compile_statement(self, node):
+        node_type = type(node)
+        if node_type == ast.ExpressionStatement:
+            self.compile_expression(node.expression)
+            return True
+        elif node_type == ast.LetStatement:
+            self.compile_expression(node.value)
+            self.emit(code.SET_LOCAL, self.add_name(node.name))
+            return False
+        elif node_type == ast.ReturnStatement:
+            # 式の途中にある return でも関数をすぐに抜ける。ツリーウォーカーは
+            # RETURN_VALUE を値として式に渡してしまうので、ここは挙動が異なる
+            self.compile_expression(node.return_value)
+            self.emit(code.RETURN)
+            return False
+        else:
+            self.emit(code.LOAD_NULL)
+            return True
+
+    def compile_expression(self, node):
+        node_type = type(node)
+        if node_type == ast.IntegerLiteral:
+            index = self.add_constant(node.value, node.constant)
+            self.emit(code.LOAD_CONST, index)
+        elif node_type == ast.BooleanLiteral:
+            self.emit(code.LOAD_TRUE if node.value else code.LOAD_FALSE)
+        elif (node_type == ast.PrefixExpression or node_type == ast.InfixExpression) \
+                and node.constant is not None:
+            constant = node.constant
+            if type(constant) == Integer:
+                self.emit(code.LOAD_CONST, self.add_constant(constant.value, constant))
+            else:
+                self.emit(code.LOAD_TRUE if constant is TRUE else code.LOAD_FALSE)
+        elif node_type == ast.PrefixExpression and node.operator == "-" \
+                and type(node.right) == ast.IntegerLiteral:
+            value = -node.right.value
+            self.emit(code.LOAD_CONST, self.add_constant(value, make_int(value)))
+        elif node_type == ast.PrefixExpression:
+            self.compile_expression(node.right)
+            self.emit(code.PREFIX_OPCODES[node.operator])
+        elif node_type == ast.InfixExpression:
+            self.compile_expression(node.left)
+            self.compile_expression(node.right)
+            self.emit(code.INFIX_OPCODES[node.operator])
+        elif node_type == ast.IfExpression:
+            self.compile_if_expression(node)
+        elif node_type == ast.Identifier:
+            self.emit(code.GET_LOCAL, self.add_name(node))
+        elif node_type == ast.FunctionLiteral:
+            bytecode = Compiler().compile_function(node)
+            function = CompiledFunction(
+                node.parameters, node.body, node.scope, bytecode)
+            self.emit(code.MAKE_FUNCTION, self.add_constant(node, function))
+        elif node_type == ast.CallExpression:
+            self.compile_expression(node.function)
+            for argument in node.arguments:
+                self.compile_expression(argument)
+            op = code.TAIL_CALL if node.tail else code.CALL
+            self.emit(op, len(node.arguments))
+        else:
+            self.emit(code.LOAD_NULL)
+
+    def compile_if_expression(self, node):
+        self.compile_expression(node.condition)
+        jump_if_false = self.emit(code.JUMP_IF_FALSE)
+
+        self.compile_statements(node.consequence.statements)
+        jump = self.emit(code.JUMP)
+
+        self.patch(jump_if_false, self.current_position())
+        if node.alternative:
+            self.compile_statements(node.alternative.statements)
+        else:
+            self.emit(code.LOAD_NULL)
+
+        self.patch(jump, self.current_position())
+
+
+def compile(program, scope):
+    # 実行する Environment の scope で解決しないと slot が合わない
+    fold_constants(program)
+    resolve_program(program, scope)
+    return Compiler().compile_program(program)
@@ -1,17 +1,56 @@
 
-class Environment:
+class Scope:
     def __init__(self, outer=None):
-        self.__outer = outer
-        self.__store = {}
+        self.outer = outer
+        self.names = {}
+
+    def define(self, name):
+        if name not in self.names:
+            self.names[name] = len(self.names)
+
+        return self.names[name]
+
+    def resolve(self, name):
+        depth = 0
+        scope = self
+        while scope is not None:
+            if name in scope.names:
+                return depth, scope.names[name]
+            scope = scope.outer
+            depth += 1
+
+        return None
+
+
+class Environment:
+    __slots__ = ("outer", "scope", "slots")
+
+    def __init__(self, outer=None, scope=None):
+        if scope is None:
+            scope = Scope(outer.scope if outer is not None else None)
+
+        self.outer = outer
+        self.scope = scope
+        self.slots = [None] * len(scope.names)
+
+    def reserve(self):
+        missing = len(self.scope.names) - len(self.slots)
+        if missing > 0:
+            self.slots.extend([None] * missing)
 
     def set(self, name, obj):
-        self.__store[name] = obj
+        slot = self.scope.define(name)
+        self.reserve()
+        self.slots[slot] = obj
 
     def get(self, name):
-        if name not in self.__store:
-            if self.__outer != None:
-                return self.__outer.get(name)
-            else:
-                return None
+        env = self
+        while env is not None:
+            slot = env.scope.names.get(name)
+            if slot is not None:
+                val = env.slots[slot]
+                if val is not None:
+                    return val
+            env = env.outer
 
-        return self.__store[name]
+        return None
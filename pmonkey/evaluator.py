@@ -1,99 +1,384 @@
+import operator
+from collections import OrderedDict
 import pmonkey.objects as obj
 import pmonkey.ast as ast
 from pmonkey.environment import Environment
 from pmonkey.objects import Integer
 from pmonkey.objects import Boolean
-from pmonkey.objects import Null
 from pmonkey.objects import ReturnValue
 from pmonkey.objects import Error
 from pmonkey.objects import Function
-
-TRUE = Boolean(True)
-FALSE = Boolean(False)
-NULL = Null()
+from pmonkey.objects import TailCall
+from pmonkey.objects import TRUE
+from pmonkey.objects import FALSE
+from pmonkey.objects import NULL
+from pmonkey.objects import make_int
+from pmonkey.resolver import resolve_program
+from pmonkey.resolver import children
 
 
 def eval(node, env):
+    if type(node) is ast.Program:
+        fold_constants(node)
+        resolve_program(node, env.scope)
+        env.reserve()
+
+    return compile_ast(node)(env)
+
+
+def fold_constants(program):
+    # 子から先に畳み込む。結果は式の constant に持たせ、AST 自体は書き換えない
+    for node in reversed(collect_nodes(program)):
+        node_type = type(node)
+        if node_type == ast.PrefixExpression or node_type == ast.InfixExpression:
+            node.constant = fold_expression(node)
+
+
+def collect_nodes(node):
+    nodes = []
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        if type(node) == ast.FunctionLiteral:
+            pending.append(node.body)
+        elif node is not None:
+            nodes.append(node)
+            pending.extend(children(node))
+
+    return nodes
+
+
+def fold_expression(node):
+    if type(node) == ast.PrefixExpression:
+        right = constant_of(node.right)
+        if right is None:
+            return None
+        result = eval_prefix_expression(node.operator, right)
+    else:
+        left = constant_of(node.left)
+        right = constant_of(node.right)
+        if left is None or right is None:
+            return None
+        if node.operator == "/" and right.value == 0:
+            return None
+        result = eval_infix_expression(node.operator, left, right)
+
+    result_type = type(result)
+    if result_type == Integer or result_type == Boolean:
+        return result
+    return None
+
+
+def constant_of(node):
     node_type = type(node)
-    if node_type == ast.Program:
-        return eval_program(node.statements, env)
-    elif node_type == ast.ExpressionStatement:
-        return eval(node.expression, env)
-    elif node_type == ast.IntegerLiteral:
-        int_obj = Integer(node.value)
-        return int_obj
-    elif node_type == ast.BooleanLiteral:
-        bool_obj = native_boolean_to_boolean_object(node.value)
-        return bool_obj
-    elif node_type == ast.PrefixExpression:
-        right = eval(node.right, env)
-        if is_error(right):
-            return right
-        return eval_prefix_expression(node.operator, right)
-    elif node_type == ast.InfixExpression:
-        left = eval(node.left, env)
+    if node_type == ast.IntegerLiteral or node_type == ast.BooleanLiteral \
+            or node_type == ast.PrefixExpression \
+            or node_type == ast.InfixExpression:
+        return node.constant
+    return None
+
+
+def compile_ast(node):
+    # 入れ子の式は compile_ast と実行時のクロージャの両方で再帰する。
+    # 再帰しないのは左結合の二項演算の連鎖だけ (compile_infix_expression)
+    return COMPILERS.get(type(node), compile_null)(node)
+
+
+def compile_program(node):
+    statements = [compile_ast(s) for s in node.statements]
+    RETURN_VALUE_OBJ = obj.RETURN_VALUE_OBJ
+    ERROR_OBJ = obj.ERROR_OBJ
+
+    def program(env):
+        result = None
+        for statement in statements:
+            result = statement(env)
+            if result is not None:
+                result_type = result.TYPE
+                if result_type is RETURN_VALUE_OBJ:
+                    return result.value
+                elif result_type is ERROR_OBJ:
+                    return result
+
+        return result
+
+    return program
+
+
+def compile_block_statement(node):
+    statements = [compile_ast(s) for s in node.statements]
+    RETURN_VALUE_OBJ = obj.RETURN_VALUE_OBJ
+    ERROR_OBJ = obj.ERROR_OBJ
+
+    def block_statement(env):
+        result = NULL
+        for statement in statements:
+            result = statement(env)
+            if result is not None:
+                result_type = result.TYPE
+                if result_type is RETURN_VALUE_OBJ or result_type is ERROR_OBJ:
+                    return result
+
+        return result
+
+    return block_statement
+
+
+def compile_expression_statement(node):
+    return compile_ast(node.expression)
+
+
+def compile_literal(node):
+    constant = node.constant
+    return lambda env: constant
+
+
+def compile_identifier(node):
+    slot = node.slot
+    if node.depth == 0:
+        def local_identifier(env):
+            val = env.slots[slot]
+            if val is None:
+                return eval_identifier(node, env)
+            return val
+
+        return local_identifier
+    elif node.depth == 1:
+        def outer_identifier(env):
+            val = env.outer.slots[slot]
+            if val is None:
+                return eval_identifier(node, env)
+            return val
+
+        return outer_identifier
+    else:
+        return lambda env: eval_identifier(node, env)
+
+
+def compile_prefix_expression(node):
+    if node.constant is not None:
+        return compile_literal(node)
+
+    right = compile_ast(node.right)
+    op = node.operator
+
+    def prefix_expression(env, _is_error=is_error,
+                          _eval_prefix=eval_prefix_expression):
+        val = right(env)
+        if _is_error(val):
+            return val
+        return _eval_prefix(op, val)
+
+    return prefix_expression
+
+
+def compile_infix_expression(node):
+    if node.constant is not None:
+        return compile_literal(node)
+
+    # 左結合の連鎖はループで評価し、木の深さだけ再帰しないようにする
+    operators = []
+    operands = []
+    operand = node
+    while type(operand) is ast.InfixExpression and operand.constant is None:
+        operators.append(operand.operator)
+        operands.append(operand.right)
+        operand = operand.left
+    operands.append(operand)
+    operators.reverse()
+    operands.reverse()
+
+    # 先頭から同じ + か * が続く部分はまとめて一度に計算する
+    n = 0
+    if operators[0] in ("+", "*"):
+        while n < len(operators) and operators[n] == operators[0]:
+            n += 1
+
+    if n > 1:
+        first = compile_nary_op(operators[0], operands[:n + 1])
+        if n == len(operators):
+            return first
+    else:
+        n = 0
+        first = compile_ast(operands[0])
+
+    operations = [(operators[i], compile_ast(operands[i + 1]))
+                  for i in range(n, len(operators))]
+
+    if len(operations) > 1:
+        def infix_chain(env, _is_error=is_error,
+                        _eval_infix=eval_infix_expression):
+            left = first(env)
+            if _is_error(left):
+                return left
+
+            for op, right in operations:
+                val = right(env)
+                if _is_error(val):
+                    return val
+                left = _eval_infix(op, left, val)
+                if _is_error(left):
+                    return left
+
+            return left
+
+        return infix_chain
+
+    op, right = operations[0]
+    integer_operation = INFIX_OPERATIONS[(op, Integer, Integer)]
+
+    def infix_expression(env, _type=type, _Integer=Integer,
+                         _is_error=is_error,
+                         _eval_infix=eval_infix_expression):
+        left = first(env)
+        if _is_error(left):
+            return left
+
+        val = right(env)
+        if _is_error(val):
+            return val
+
+        if _type(left) is _Integer and _type(val) is _Integer:
+            return integer_operation(left, val)
+        return _eval_infix(op, left, val)
+
+    return infix_expression
+
+
+def compile_nary_op(op, operands):
+    operands = [compile_ast(o) for o in operands]
+    is_sum = op == "+"
+
+    def nary_op(env, _type=type, _Integer=Integer, _make_int=make_int):
+        total = 0 if is_sum else 1
+        for i, operand in enumerate(operands):
+            val = operand(env)
+            if _type(val) is not _Integer:
+                left = _make_int(total) if i else None
+                return eval_nary_op_fallback(op, operands, i, left, val, env)
+
+            if is_sum:
+                total += val.value
+            else:
+                total *= val.value
+
+        return _make_int(total)
+
+    return nary_op
+
+
+def eval_nary_op_fallback(op, operands, i, left, val, env):
+    # 整数以外が出てきたら、そこからは二項演算を順にたどってエラーも同じにする
+    if is_error(val):
+        return val
+
+    if left is None:
+        left = val
+    else:
+        left = eval_infix_expression(op, left, val)
         if is_error(left):
             return left
 
-        right = eval(node.right, env)
-        if is_error(right):
-            return right
-
-        return eval_infix_expression(node.operator, left, right)
-    elif node_type == ast.BlockStatement:
-        return eval_block_statement(node.statements, env)
-    elif node_type == ast.IfExpression:
-        return eval_if_expression(node, env)
-    elif node_type == ast.ReturnStatement:
-        val = eval(node.return_value, env)
+    for operand in operands[i + 1:]:
+        val = operand(env)
         if is_error(val):
             return val
-        return ReturnValue(val)
-    elif node_type == ast.LetStatement:
-        val = eval(node.value, env)
-        if is_error(val):
+        left = eval_infix_expression(op, left, val)
+        if is_error(left):
+            return left
+
+    return left
+
+
+def compile_if_expression(node):
+    condition = compile_ast(node.condition)
+    consequence = compile_ast(node.consequence)
+    alternative = compile_ast(node.alternative) if node.alternative else None
+
+    def if_expression(env, _is_error=is_error, _NULL=NULL):
+        val = condition(env)
+        if _is_error(val):
             return val
-        env.set(node.name.value, val)
-        return
-    elif node_type == ast.Identifier:
-        return eval_identifier(node, env)
-    elif node_type == ast.FunctionLiteral:
-        params = node.parameters
-        body = node.body
-        return Function(params, body, env)
-    elif node_type == ast.CallExpression:
-        function = eval(node.function, env)
-        if is_error(function):
-            return function
-        args = eval_expressions(node.arguments, env)
-        if len(args) == 1 and is_error(args[0]):
-            return args
-
-        return apply_function(function, args)
-    else:
-        return NULL
 
+        if val.truthy:
+            return consequence(env)
+        elif alternative is not None:
+            return alternative(env)
+        else:
+            return _NULL
 
-def eval_program(statements, env):
-    for statement in statements:
-        result = eval(statement, env)
-        if result != None:
-            if result.type() == obj.RETURN_VALUE_OBJ:
-                return result.value
-            elif result.type() == obj.ERROR_OBJ:
-                return result
+    return if_expression
 
-    return result
 
+def compile_return_statement(node):
+    return_value = compile_ast(node.return_value)
 
-def eval_block_statement(statements, env):
-    for statement in statements:
-        result = eval(statement, env)
+    def return_statement(env, _is_error=is_error, _ReturnValue=ReturnValue):
+        val = return_value(env)
+        if _is_error(val):
+            return val
+        return _ReturnValue(val)
 
-        if result.type() == obj.RETURN_VALUE_OBJ or result.type() == obj.ERROR_OBJ:
-            return result
+    return return_statement
+
+
+def compile_let_statement(node):
+    value = compile_ast(node.value)
+    name = node.name.value
+    slot = node.name.slot
+
+    def let_statement(env, _is_error=is_error):
+        val = value(env)
+        if _is_error(val):
+            return val
+
+        if slot is None:
+            env.set(name, val)
+        else:
+            env.slots[slot] = val
+
+    return let_statement
+
+
+def compile_function_literal(node):
+    body = compile_ast(node.body)
+
+    def function_literal(env):
+        return Function(node.parameters, node.body, env, node.scope,
+                        pure=node.pure, self_slot=node.self_slot,
+                        compiled_body=body)
 
-    return result
+    return function_literal
+
+
+def compile_call_expression(node):
+    function = compile_ast(node.function)
+    arguments = [compile_ast(a) for a in node.arguments]
+    n = len(arguments)
+    tail = node.tail
+
+    def call_expression(env, _is_error=is_error, _TailCall=TailCall,
+                        _apply=apply_function):
+        fn = function(env)
+        if _is_error(fn):
+            return fn
+
+        args = [None] * n
+        for i in range(n):
+            val = arguments[i](env)
+            if _is_error(val):
+                return val
+            args[i] = val
+
+        if tail:
+            return _TailCall(fn, args)
+        return _apply(fn, args)
+
+    return call_expression
+
+
+def compile_null(node):
+    return lambda env: NULL
 
 
 def eval_prefix_expression(op, right):
@@ -105,124 +390,186 @@ def eval_prefix_expression(op, right):
         return Error(f"unknown operator: {op}{right.type()}")
 
 
-def eval_infix_expression(op, left, right):
-    if type(left) == Integer and type(right) == Integer:
-        return eval_integer_infix_expression(op, left, right)
+def int_div(left, right):
+    # Go と同じく、整数の割り算は 0 に向かって切り捨てる
+    quotient = abs(left) // abs(right)
+    return quotient if (left < 0) == (right < 0) else -quotient
+
+
+_INT_OPS = {
+    "+": (operator.add, True),
+    "-": (operator.sub, True),
+    "*": (operator.mul, True),
+    "/": (int_div, True),
+    "<": (operator.lt, False),
+    ">": (operator.gt, False),
+    "==": (operator.eq, False),
+    "!=": (operator.ne, False),
+}
+
+
+def make_integer_operation(fn, is_int):
+    if is_int:
+        return lambda l, r: make_int(fn(l.value, r.value))
+    return lambda l, r: TRUE if fn(l.value, r.value) else FALSE
+
+
+INFIX_OPERATIONS = {
+    (op, Integer, Integer): make_integer_operation(fn, is_int)
+    for op, (fn, is_int) in _INT_OPS.items()
+}
+INFIX_OPERATIONS[("==", Boolean, Boolean)] = lambda l, r: TRUE if l is r else FALSE
+INFIX_OPERATIONS[("!=", Boolean, Boolean)] = lambda l, r: TRUE if l is not r else FALSE
+
+
+def eval_infix_expression(op, left, right, _type=type, _TRUE=TRUE,
+                          _FALSE=FALSE, _operations=INFIX_OPERATIONS):
+    operation = _operations.get((op, _type(left), _type(right)))
+    if operation is not None:
+        return operation(left, right)
     elif op == "==":
-        return native_boolean_to_boolean_object(left == right)
+        return _TRUE if left is right else _FALSE
     elif op == "!=":
-        return native_boolean_to_boolean_object(left != right)
+        return _TRUE if left is not right else _FALSE
     elif left.type() != right.type():
         return Error(f"type mismatch: {left.type()} {op} {right.type()}")
     else:
         return Error(f"unknown operator: {left.type()} {op} {right.type()}")
 
 
-def eval_bang_operator_expression(right):
-    if right == TRUE:
-        return FALSE
-    elif right == FALSE:
-        return TRUE
-    elif right == NULL:
-        return TRUE
+def eval_bang_operator_expression(right, _TRUE=TRUE, _FALSE=FALSE,
+                                   _NULL=NULL):
+    if right is _TRUE:
+        return _FALSE
+    elif right is _FALSE:
+        return _TRUE
+    elif right is _NULL:
+        return _TRUE
     else:
-        return FALSE
+        return _FALSE
 
 
-def eval_minus_prefix_operator_expression(right):
-    if type(right) != Integer:
+def eval_minus_prefix_operator_expression(right, _type=type,
+                                           _Integer=Integer,
+                                           _make_int=make_int):
+    if _type(right) is not _Integer:
         return Error(f"unknown operator: -{right.type()}")
 
     value = right.value
-    return Integer(-value)
+    return _make_int(-value)
 
 
-def eval_integer_infix_expression(op, left, right):
-    if op == "+":
-        return Integer(left.value + right.value)
-    elif op == "-":
-        return Integer(left.value - right.value)
-    elif op == "*":
-        return Integer(left.value * right.value)
-    elif op == "/":
-        return Integer(left.value / right.value)
-    elif op == "<":
-        return native_boolean_to_boolean_object(left.value < right.value)
-    elif op == ">":
-        return native_boolean_to_boolean_object(left.value > right.value)
-    elif op == "==":
-        return native_boolean_to_boolean_object(left.value == right.value)
-    elif op == "!=":
-        return native_boolean_to_boolean_object(left.value != right.value)
-    else:
-        return Error(f"unknown operator: {left.type()} {op} {right.type()}")
+def eval_identifier(node, env):
+    depth = node.depth
+    if depth is not None:
+        frame = env
+        while depth:
+            frame = frame.outer
+            depth -= 1
+
+        val = frame.slots[node.slot]
+        if val is not None:
+            return val
 
+    val = env.get(node.value)
+    if val is None:
+        return Error(f"identifier not found: {node.value}")
+    return val
 
-def eval_if_expression(node, env):
-    condition = eval(node.condition, env)
-    if is_error(condition):
-        return condition
 
-    if is_truthy(condition):
-        return eval(node.consequence, env)
-    elif node.alternative:
-        return eval(node.alternative, env)
-    else:
-        return NULL
+def is_truthy(value):
+    return value.truthy
 
 
-def eval_identifier(node, env):
-    val = env.get(node.value)
-    if val == None:
-        return Error(f"identifier not found: {node.value}")
-    return val
+def is_error(node, _ERROR_OBJ=obj.ERROR_OBJ):
+    return node is not None and node.TYPE is _ERROR_OBJ
 
 
-def eval_expressions(exps, env):
-    values = []
-    for e in exps:
-        evaluated = eval(e, env)
-        if is_error(evaluated):
-            return [evaluated]
-        values.append(evaluated)
+def extend_function_environment(function, args, _Environment=Environment):
+    internal_env = _Environment(function.env, function.scope)
+    slots = internal_env.slots
+    for i, param in enumerate(function.parameters):
+        slots[param.slot] = args[i]
 
-    return values
+    return internal_env
 
 
-def is_truthy(value):
-    if value == NULL:
-        return False
-    elif value == TRUE:
-        return True
-    elif value == FALSE:
-        return False
-    else:
-        return True
+def call_function(function, args, _type=type, _Function=Function,
+                  _extend=extend_function_environment,
+                  _RETURN_VALUE_OBJ=obj.RETURN_VALUE_OBJ,
+                  _TAIL_CALL_OBJ=obj.TAIL_CALL_OBJ):
+    while True:
+        if _type(function) is not _Function:
+            return Error(f"not a function: {function.type()}")
 
+        env = _extend(function, args)
+        evaluated = function.compiled_body(env)
+        if evaluated is None:
+            return evaluated
 
-def apply_function(function, args):
-    env = extend_function_environment(function, args)
-    evaluated = eval(function.body, env)
-    if is_error(evaluated):
-        return evaluated
+        if evaluated.TYPE is _RETURN_VALUE_OBJ:
+            evaluated = evaluated.value
 
-    if evaluated.type() == obj.RETURN_VALUE_OBJ:
-        return evaluated.value
-    else:
-        return evaluated
+        if evaluated.TYPE is _TAIL_CALL_OBJ:
+            function = evaluated.function
+            args = evaluated.args
+        else:
+            return evaluated
 
 
-def extend_function_environment(function, args):
-    internal_env = Environment(function.env)
-    for i, param in enumerate(function.parameters):
-        internal_env.set(param.value, args[i])
+MEMO_SIZE = 4096
 
-    return internal_env
 
+def memo_key(function, args, _type=type, _Integer=Integer):
+    # 再帰呼び出し先が別の値に束縛し直されていたら結果を使い回せない
+    if function.env.slots[function.self_slot] is not function:
+        return None
 
-def native_boolean_to_boolean_object(boolean_value):
-    return TRUE if boolean_value else FALSE
+    values = []
+    for arg in args:
+        if _type(arg) is not _Integer:
+            return None
+        values.append(arg.value)
+
+    return tuple(values)
+
+
+def apply_function(function, args, _type=type, _Function=Function,
+                   _call=call_function, _memo_key=memo_key):
+    if _type(function) is _Function and function.pure:
+        key = _memo_key(function, args)
+        if key is not None:
+            # 結果は関数ごとに持つので、関数と一緒に捨てられる
+            memo = function.memo
+            if memo is None:
+                memo = function.memo = OrderedDict()
+
+            result = memo.get(key)
+            if result is not None:
+                memo.move_to_end(key)
+                return result
 
+            result = _call(function, args)
+            memo[key] = result
+            if len(memo) > MEMO_SIZE:
+                memo.popitem(last=False)
+            return result
 
-def is_error(node):
-    return node.type() == obj.ERROR_OBJ
+    return _call(function, args)
+
+
+COMPILERS = {
+    ast.Program: compile_program,
+    ast.ExpressionStatement: compile_expression_statement,
+    ast.IntegerLiteral: compile_literal,
+    ast.BooleanLiteral: compile_literal,
+    ast.PrefixExpression: compile_prefix_expression,
+    ast.InfixExpression: compile_infix_expression,
+    ast.BlockStatement: compile_block_statement,
+    ast.IfExpression: compile_if_expression,
+    ast.ReturnStatement: compile_return_statement,
+    ast.LetStatement: compile_let_statement,
+    ast.Identifier: compile_identifier,
+    ast.FunctionLiteral: compile_function_literal,
+    ast.CallExpression: compile_call_expression,
+}
@@ -0,0 +1,410 @@
+import pmonkey.code as code
+from pmonkey.objects import Integer
+from pmonkey.objects import TRUE
+from pmonkey.objects import FALSE
+from pmonkey.objects import make_int
+
+try:
+    import numpy as np
+    from numba import njit
+    ENABLED = True
+except ImportError:
+    np = None
+    ENABLED = False
+
+    def njit(*args, **kwargs):
+        return lambda fn: fn
+
+INT = "INT"
+BOOL = "BOOL"
+NULL_KIND = "NULL"
+FUNC = "FUNC"
+
+OK = 0
+BAIL = 1
+
+# 1フレームで使えるスタックの深さと、再帰呼び出しの深さの上限
+FRAME_STACK_SIZE = 64
+MAX_FRAMES = 1024
+STACK_SIZE = FRAME_STACK_SIZE * MAX_FRAMES
+VALUE_LIMIT = 2 ** 62
+MUL_LIMIT = 2 ** 31
+
+# 整数VMで実行できる命令
+INT_OPCODES = {
+    code.LOAD_CONST,
+    code.LOAD_TRUE,
+    code.LOAD_FALSE,
+    code.LOAD_NULL,
+    code.GET_LOCAL,
+    code.POP,
+    code.ADD,
+    code.SUB,
+    code.MUL,
+    code.LT,
+    code.GT,
+    code.EQ,
+    code.NEQ,
+    code.NEG,
+    code.BANG,
+    code.JUMP,
+    code.JUMP_IF_FALSE,
+    code.RETURN,
+    code.CALL,
+    code.TAIL_CALL,
+    code.ADD_LOCAL_CONST,
+    code.SUB_LOCAL_CONST,
+    code.LT_LOCAL_CONST_JUMP_IF_FALSE,
+    code.LT_LOCALS_JUMP_IF_FALSE,
+    code.EXTENDED_ARG,
+}
+
+
+class IntProgram:
+    def __init__(self, opcodes, operands, result_kind, self_binding):
+        self.opcodes = opcodes
+        self.operands = operands
+        self.result_kind = result_kind
+        self.self_binding = self_binding
+
+
+def call(function, args):
+    bytecode = function.bytecode
+    program = bytecode.int_program
+    if program is None:
+        program = compile_function(bytecode, function.parameters)
+        bytecode.int_program = program
+
+    if program is False:
+        return None
+
+    # 呼び出し先の名前がいまもこの関数自身を指しているときだけ整数VMで再帰できる
+    depth, slot = program.self_binding
+    env = function.env
+    while depth > 1:
+        env = env.outer
+        depth -= 1
+    if env.slots[slot] is not function:
+        return None
+
+    locals_ = []
+    for arg in args:
+        if type(arg) != Integer or not -VALUE_LIMIT < arg.value < VALUE_LIMIT:
+            return None
+        locals_.append(arg.value)
+
+    if len(locals_) != len(function.parameters):
+        return None
+
+    status, value = run_int_vm(
+        program.opcodes, program.operands, int_array(locals_))
+    if status != OK:
+        return None
+
+    if program.result_kind == BOOL:
+        return TRUE if value else FALSE
+    return make_int(int(value))
+
+
+def compile_function(bytecode, parameters):
+    opcodes, operands, result_kind, self_binding = translate(bytecode, parameters)
+    # 自己再帰しない関数は数命令で終わり、呼び出しの変換コストを取り戻せない
+    if result_kind is None or self_binding is None:
+        return False
+
+    return IntProgram(
+        int_array(opcodes), int_array(operands), result_kind, self_binding)
+
+
+def int_array(values):
+    # numba には本番と同じ int64 配列を渡す。numba が無いときはリストのまま動かす
+    if np is None:
+        return list(values)
+    return np.array(values, dtype=np.int64)
+
+
+def translate(bytecode, parameters):
+    opcodes = list(bytecode.opcodes)
+    operands = list(bytecode.operands)
+    if any(op not in INT_OPCODES for op in opcodes):
+        return opcodes, operands, None, None
+
+    # 引数は関数スコープの先頭のスロットに入る
+    def local(index):
+        binding = bytecode.bindings[index]
+        if binding is None or binding[0] != 0 or binding[1] >= len(parameters):
+            return None
+        return binding[1]
+
+    def constant(index):
+        const = bytecode.constants[index]
+        if type(const) != Integer or not -VALUE_LIMIT < const.value < VALUE_LIMIT:
+            return None
+        return const.value
+
+    result_kind = None
+    self_binding = None
+    states = {0: ()}
+    pending = [0]
+    while pending:
+        ip = pending.pop()
+        stack = list(states[ip])
+        op = opcodes[ip]
+        arg = operands[ip]
+        successors = [ip + 1]
+
+        if op == code.LOAD_CONST:
+            value = constant(arg)
+            if value is None:
+                return opcodes, operands, None, None
+            operands[ip] = value
+            stack.append(INT)
+        elif op == code.LOAD_TRUE or op == code.LOAD_FALSE:
+            stack.append(BOOL)
+        elif op == code.LOAD_NULL:
+            stack.append(NULL_KIND)
+        elif op == code.GET_LOCAL and local(arg) is not None:
+            operands[ip] = local(arg)
+            stack.append(INT)
+        elif op == code.GET_LOCAL:
+            # 引数以外に読めるのは自分自身の名前だけで、呼び出し先にしか使えない
+            binding = bytecode.bindings[arg]
+            if binding is None or binding[0] == 0:
+                return opcodes, operands, None, None
+            if self_binding is not None and binding != self_binding:
+                return opcodes, operands, None, None
+            self_binding = binding
+            opcodes[ip] = code.LOAD_CONST
+            operands[ip] = 0
+            stack.append(FUNC)
+        elif op == code.POP:
+            stack.pop()
+        elif op in (code.ADD, code.SUB, code.MUL, code.LT, code.GT):
+            right = stack.pop()
+            left = stack.pop()
+            if left != INT or right != INT:
+                return opcodes, operands, None, None
+            stack.append(INT if op in (code.ADD, code.SUB, code.MUL) else BOOL)
+        elif op == code.EQ or op == code.NEQ:
+            right = stack.pop()
+            left = stack.pop()
+            if left != right or left == NULL_KIND or left == FUNC:
+                return opcodes, operands, None, None
+            stack.append(BOOL)
+        elif op == code.NEG:
+            if stack[-1] != INT:
+                return opcodes, operands, None, None
+        elif op == code.BANG:
+            if stack[-1] == NULL_KIND or stack[-1] == FUNC:
+                return opcodes, operands, None, None
+            operands[ip] = 1 if stack[-1] == INT else 0
+            stack[-1] = BOOL
+        elif op == code.JUMP:
+            successors = [arg]
+        elif op == code.JUMP_IF_FALSE:
+            kind = stack.pop()
+            if kind == NULL_KIND or kind == FUNC:
+                return opcodes, operands, None, None
+            elif kind == INT:
+                # 整数は常に真
+                opcodes[ip] = code.POP
+            else:
+                successors.append(arg)
+        elif op == code.RETURN:
+            kind = stack.pop()
+            if kind == NULL_KIND or kind == FUNC:
+                return opcodes, operands, None, None
+            if result_kind is not None and kind != result_kind:
+                return opcodes, operands, None, None
+            result_kind = kind
+            successors = []
+        elif op == code.CALL or op == code.TAIL_CALL:
+            if arg != len(parameters) or len(stack) <= arg:
+                return opcodes, operands, None, None
+            args = stack[len(stack) - arg:]
+            del stack[len(stack) - arg:]
+            if stack.pop() != FUNC or any(kind != INT for kind in args):
+                return opcodes, operands, None, None
+            # 再帰呼び出しの結果は整数に限る (関数の結果の型は最後に確かめる)
+            if op == code.CALL:
+                stack.append(INT)
+            else:
+                if result_kind is not None and result_kind != INT:
+                    return opcodes, operands, None, None
+                result_kind = INT
+                successors = []
+        elif op == code.ADD_LOCAL_CONST or op == code.SUB_LOCAL_CONST:
+            value = constant(operands[ip + 1])
+            if local(arg) is None or value is None:
+                return opcodes, operands, None, None
+            operands[ip] = local(arg)
+            operands[ip + 1] = value
+            stack.append(INT)
+            successors = [ip + 2]
+        elif op == code.LT_LOCAL_CONST_JUMP_IF_FALSE:
+            value = constant(operands[ip + 1])
+            if local(arg) is None or value is None:
+                return opcodes, operands, None, None
+            operands[ip] = local(arg)
+            operands[ip + 1] = value
+            successors = [ip + 3, operands[ip + 2]]
+        elif op == code.LT_LOCALS_JUMP_IF_FALSE:
+            if local(arg) is None or local(operands[ip + 1]) is None:
+                return opcodes, operands, None, None
+            operands[ip] = local(arg)
+            operands[ip + 1] = local(operands[ip + 1])
+            successors = [ip + 3, operands[ip + 2]]
+        else:
+            return opcodes, operands, None, None
+
+        if len(stack) > FRAME_STACK_SIZE:
+            return opcodes, operands, None, None
+
+        for successor in successors:
+            state = tuple(stack)
+            if successor not in states:
+                states[successor] = state
+                pending.append(successor)
+            elif states[successor] != state:
+                return opcodes, operands, None, None
+
+    if self_binding is not None and result_kind != INT:
+        return opcodes, operands, None, None
+    return opcodes, operands, result_kind, self_binding
+
+
+if np is None:
+    def new_array(size):
+        return [0] * size
+else:
+    @njit(cache=True)
+    def new_array(size):
+        return np.empty(size, np.int64)
+
+
+@njit(cache=True)
+def run_int_vm(opcodes, operands, args):
+    # 呼び出しごとの引数・戻り先・スタックの底を配列に積んで、再帰を箱なしで回す
+    nargs = len(args)
+    stack = new_array(STACK_SIZE)
+    locals_ = new_array(MAX_FRAMES * nargs)
+    returns = new_array(MAX_FRAMES)
+    bases = new_array(MAX_FRAMES)
+    for i in range(nargs):
+        locals_[i] = args[i]
+    depth = 0
+    bp = 0
+    base = 0
+    sp = 0
+    ip = 0
+    while True:
+        op = opcodes[ip]
+        arg = operands[ip]
+        ip += 1
+
+        if op == code.GET_LOCAL:
+            stack[sp] = locals_[bp + arg]
+            sp += 1
+        elif op == code.LOAD_CONST:
+            stack[sp] = arg
+            sp += 1
+        elif op == code.ADD_LOCAL_CONST or op == code.SUB_LOCAL_CONST:
+            if op == code.ADD_LOCAL_CONST:
+                value = locals_[bp + arg] + operands[ip]
+            else:
+                value = locals_[bp + arg] - operands[ip]
+            if value >= VALUE_LIMIT or value <= -VALUE_LIMIT:
+                return BAIL, 0
+            stack[sp] = value
+            sp += 1
+            ip += 1
+        elif op == code.LT_LOCAL_CONST_JUMP_IF_FALSE:
+            if not locals_[bp + arg] < operands[ip]:
+                ip = operands[ip + 1]
+            else:
+                ip += 2
+        elif op == code.LT_LOCALS_JUMP_IF_FALSE:
+            if not locals_[bp + arg] < locals_[bp + operands[ip]]:
+                ip = operands[ip + 1]
+            else:
+                ip += 2
+        elif op == code.ADD or op == code.SUB:
+            sp -= 1
+            if op == code.ADD:
+                value = stack[sp - 1] + stack[sp]
+            else:
+                value = stack[sp - 1] - stack[sp]
+            if value >= VALUE_LIMIT or value <= -VALUE_LIMIT:
+                return BAIL, 0
+            stack[sp - 1] = value
+        elif op == code.MUL:
+            sp -= 1
+            left = stack[sp - 1]
+            right = stack[sp]
+            if abs(left) >= MUL_LIMIT or abs(right) >= MUL_LIMIT:
+                return BAIL, 0
+            stack[sp - 1] = left * right
+        elif op == code.LT:
+            sp -= 1
+            stack[sp - 1] = 1 if stack[sp - 1] < stack[sp] else 0
+        elif op == code.GT:
+            sp -= 1
+            stack[sp - 1] = 1 if stack[sp - 1] > stack[sp] else 0
+        elif op == code.EQ:
+            sp -= 1
+            stack[sp - 1] = 1 if stack[sp - 1] == stack[sp] else 0
+        elif op == code.NEQ:
+            sp -= 1
+            stack[sp - 1] = 1 if stack[sp - 1] != stack[sp] else 0
+        elif op == code.NEG:
+            stack[sp - 1] = -stack[sp - 1]
+        elif op == code.BANG:
+            if arg == 1:
+                stack[sp - 1] = 0
+            else:
+                stack[sp - 1] = 1 - stack[sp - 1]
+        elif op == code.JUMP_IF_FALSE:
+            sp -= 1
+            if stack[sp] == 0:
+                ip = arg
+        elif op == code.JUMP:
+            ip = arg
+        elif op == code.LOAD_TRUE:
+            stack[sp] = 1
+            sp += 1
+        elif op == code.LOAD_FALSE or op == code.LOAD_NULL:
+            stack[sp] = 0
+            sp += 1
+        elif op == code.POP:
+            sp -= 1
+        elif op == code.CALL:
+            if depth + 1 >= MAX_FRAMES or sp + FRAME_STACK_SIZE > STACK_SIZE:
+                return BAIL, 0
+            sp -= nargs
+            depth += 1
+            for i in range(nargs):
+                locals_[depth * nargs + i] = stack[sp + i]
+            returns[depth] = ip
+            bases[depth] = base
+            # 呼び出し先の代わりに積んだ値も捨てる
+            sp -= 1
+            base = sp
+            bp = depth * nargs
+            ip = 0
+        elif op == code.TAIL_CALL:
+            sp -= nargs
+            for i in range(nargs):
+                locals_[bp + i] = stack[sp + i]
+            sp = base
+            ip = 0
+        else:
+            value = stack[sp - 1]
+            if depth == 0:
+                return OK, value
+            sp = base
+            stack[sp] = value
+            sp += 1
+            ip = returns[depth]
+            base = bases[depth]
+            depth -= 1
+            bp = depth * nargs
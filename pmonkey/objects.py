@@ -5,9 +5,14 @@ NULL_OBJ = "NULL"
 RETURN_VALUE_OBJ = "RETURN_VALUE"
 ERROR_OBJ = "ERROR"
 FUNCTION_OBJ = "FUNCTION"
+TAIL_CALL_OBJ = "TAIL_CALL"
 
 
 class Integer:
+    __slots__ = ("value",)
+    TYPE = INTEGER_OBJ
+    truthy = True
+
     def __init__(self, value):
         self.value = value
 
@@ -15,58 +20,86 @@ class Integer:
         return str(self.value)
 
     def type(self):
-        return INTEGER_OBJ
+        return self.TYPE
 
 
 class Boolean:
+    __slots__ = ("value", "truthy")
+    TYPE = BOOLEAN_OBJ
+
     def __init__(self, value):
         self.value = value
+        self.truthy = bool(value)
 
     def inspect(self):
         return str(self.value).lower()
 
     def type(self):
-        return BOOLEAN_OBJ
+        return self.TYPE
 
 
 class Null:
+    __slots__ = ()
+    TYPE = NULL_OBJ
+    truthy = False
+
     def inspect(self):
         return "null"
 
     def type(self):
-        return NULL_OBJ
+        return self.TYPE
 
 
 class ReturnValue:
+    __slots__ = ("value",)
+    TYPE = RETURN_VALUE_OBJ
+    truthy = True
+
     def __init__(self, value):
         self.value = value
 
     def type(self):
-        return RETURN_VALUE_OBJ
+        return self.TYPE
 
     def inspect(self):
         return self.value.inspect()
 
 
 class Error:
+    __slots__ = ("message",)
+    TYPE = ERROR_OBJ
+    truthy = True
+
     def __init__(self, message):
         self.message = message
 
     def type(self):
-        return ERROR_OBJ
+        return self.TYPE
 
     def inspect(self):
         return "ERROR: " + self.message
 
 
 class Function:
-    def __init__(self, parameters, body, env):
+    __slots__ = ("parameters", "body", "env", "scope", "bytecode", "pure", "self_slot",
+                 "compiled_body", "memo")
+    TYPE = FUNCTION_OBJ
+    truthy = True
+
+    def __init__(self, parameters, body, env, scope=None, bytecode=None,
+                 pure=False, self_slot=None, compiled_body=None):
         self.parameters = parameters
         self.body = body
         self.env = env
+        self.scope = scope
+        self.bytecode = bytecode
+        self.pure = pure
+        self.self_slot = self_slot
+        self.compiled_body = compiled_body
+        self.memo = None
 
     def type(self):
-        return FUNCTION_OBJ
+        return self.TYPE
 
     def inspect(self):
         s = "fn("
@@ -75,3 +108,30 @@ class Function:
         s += str(self.body)
         s += "\n}"
         return s
+
+
+class TailCall:
+    __slots__ = ("function", "args")
+    TYPE = TAIL_CALL_OBJ
+    truthy = True
+
+    def __init__(self, function, args):
+        self.function = function
+        self.args = args
+
+    def type(self):
+        return self.TYPE
+
+
+TRUE = Boolean(True)
+FALSE = Boolean(False)
+NULL = Null()
+
+
+_SMALL_INTS = [Integer(i) for i in range(-128, 257)]
+
+
+def make_int(value):
+    if -128 <= value <= 256:
+        return _SMALL_INTS[value + 128]
+    return Integer(value)
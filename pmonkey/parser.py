@@ -1,4 +1,6 @@
+import sys
 import pmonkey.ast as ast
+import pmonkey.objects as obj
 import pmonkey.token as token
 
 LOWEST = 1
@@ -153,12 +155,14 @@ class Parser:
             return None
 
         lit.value = int(v)
+        lit.constant = obj.make_int(lit.value)
 
         return lit
     
     def parse_boolean_literal(self):
         lit = ast.BooleanLiteral(self.cur_token)
         lit.value = self.cur_token.token_type == token.TRUE
+        lit.constant = obj.TRUE if lit.value else obj.FALSE
         return lit
 
     def parse_function_literal(self):
@@ -199,6 +203,7 @@ class Parser:
 
     def parse_prefix_expression(self):
         expression = ast.PrefixExpression(self.cur_token)
+        expression.operator = sys.intern(expression.operator)
         self.next_token()
         expression.right = self.parse_expression(PREFIX)
         return expression
@@ -207,7 +212,7 @@ class Parser:
         precedence = self.cur_precedence()
         expression = ast.InfixExpression(self.cur_token)
         expression.left = left
-        expression.operator = self.cur_token.literal
+        expression.operator = sys.intern(self.cur_token.literal)
         self.next_token()
         expression.right = self.parse_expression(precedence)
 
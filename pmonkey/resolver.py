@@ -0,0 +1,116 @@
+import pmonkey.ast as ast
+from pmonkey.environment import Scope
+
+
+def resolve_program(program, scope):
+    declare(program, scope)
+    resolve(program, scope)
+
+
+def declare(node, scope):
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        node_type = type(node)
+        if node_type == ast.LetStatement:
+            scope.define(node.name.value)
+        elif node_type == ast.FunctionLiteral:
+            continue
+
+        pending.extend(children(node))
+
+
+def resolve(node, scope):
+    functions = []
+    pending = [(node, scope)]
+    while pending:
+        node, scope = pending.pop()
+        node_type = type(node)
+        if node_type == ast.Identifier:
+            binding = scope.resolve(node.value)
+            if binding is None:
+                node.depth, node.slot = None, None
+            else:
+                node.depth, node.slot = binding
+        elif node_type == ast.FunctionLiteral:
+            function_scope = Scope(scope)
+            for param in node.parameters:
+                function_scope.define(param.value)
+                pending.append((param, function_scope))
+
+            declare(node.body, function_scope)
+            pending.append((node.body, function_scope))
+            mark_tail_calls(node.body, True)
+            node.scope = function_scope
+        else:
+            if node_type == ast.LetStatement and type(node.value) == ast.FunctionLiteral:
+                functions.append(node)
+            for child in children(node):
+                pending.append((child, scope))
+
+    # 関数本体の解決が終わってから純粋性を判定する
+    for let in functions:
+        function = let.value
+        function.pure = is_pure(function.body, let.name.slot)
+        function.self_slot = let.name.slot if function.pure else None
+
+
+def is_pure(body, self_slot):
+    # 引数と自分自身への再帰呼び出し以外を参照しない関数は、引数だけで結果が決まる
+    recursive = False
+    pending = [body]
+    while pending:
+        node = pending.pop()
+        node_type = type(node)
+        if node_type == ast.FunctionLiteral or node_type == ast.LetStatement:
+            return False
+        elif node_type == ast.Identifier and node.depth != 0:
+            if node.depth != 1 or node.slot != self_slot:
+                return False
+            recursive = True
+
+        pending.extend(children(node))
+
+    return recursive
+
+
+def mark_tail_calls(block, tail):
+    last = len(block.statements) - 1
+    for i, statement in enumerate(block.statements):
+        statement_type = type(statement)
+        if statement_type == ast.ReturnStatement:
+            mark_tail_expression(statement.return_value, True)
+        elif statement_type == ast.ExpressionStatement:
+            mark_tail_expression(statement.expression, tail and i == last)
+
+
+def mark_tail_expression(expression, tail):
+    expression_type = type(expression)
+    if expression_type == ast.CallExpression:
+        expression.tail = tail
+    elif expression_type == ast.IfExpression:
+        mark_tail_calls(expression.consequence, tail)
+        if expression.alternative:
+            mark_tail_calls(expression.alternative, tail)
+
+
+def children(node):
+    node_type = type(node)
+    if node_type == ast.Program or node_type == ast.BlockStatement:
+        return node.statements
+    elif node_type == ast.ExpressionStatement:
+        return [node.expression]
+    elif node_type == ast.LetStatement:
+        return [node.value, node.name]
+    elif node_type == ast.ReturnStatement:
+        return [node.return_value]
+    elif node_type == ast.PrefixExpression:
+        return [node.right]
+    elif node_type == ast.InfixExpression:
+        return [node.left, node.right]
+    elif node_type == ast.IfExpression:
+        return [node.condition, node.consequence, node.alternative]
+    elif node_type == ast.CallExpression:
+        return [node.function] + node.arguments
+    else:
+        return []
@@ -0,0 +1,319 @@
+import pmonkey.code as code
+import pmonkey.jit as jit
+from pmonkey.objects import Integer
+from pmonkey.objects import Error
+from pmonkey.objects import Function
+from pmonkey.objects import TRUE
+from pmonkey.objects import FALSE
+from pmonkey.objects import NULL
+from pmonkey.objects import make_int
+from pmonkey.evaluator import INFIX_OPERATIONS
+from pmonkey.evaluator import eval_infix_expression
+from pmonkey.evaluator import eval_prefix_expression
+from pmonkey.evaluator import extend_function_environment
+from pmonkey.evaluator import is_truthy
+from pmonkey.evaluator import is_error
+
+HALT = -1
+TAIL = -2
+
+
+class Frame:
+    __slots__ = ("operands", "constants", "names", "bindings", "env", "stack",
+                 "result")
+
+    def __init__(self, bytecode, env):
+        self.operands = bytecode.operands
+        self.constants = bytecode.constants
+        self.names = bytecode.names
+        self.bindings = bytecode.bindings
+        self.env = env
+        self.stack = []
+        self.result = None
+
+
+def run(bytecode, env):
+    # コンパイル時に env.scope へ追加された名前の分だけ枠を広げておく
+    env.reserve()
+    return execute(bytecode, env)
+
+
+def execute(bytecode, env):
+    handlers = HANDLERS
+    while True:
+        opcodes = bytecode.opcodes
+        operands = bytecode.operands
+        frame = Frame(bytecode, env)
+        ip = 0
+        while ip >= 0:
+            ip = handlers[opcodes[ip]](frame, operands[ip], ip + 1)
+
+        if ip == HALT:
+            return frame.result
+
+        function, args = frame.result
+        if jit.ENABLED:
+            result = jit.call(function, args)
+            if result is not None:
+                return result
+
+        bytecode = function.bytecode
+        env = extend_function_environment(function, args)
+
+
+def halt(frame, result):
+    frame.result = result
+    return HALT
+
+
+def h_load_const(frame, arg, ip):
+    frame.stack.append(frame.constants[arg])
+    return ip
+
+
+def h_load_true(frame, arg, ip):
+    frame.stack.append(TRUE)
+    return ip
+
+
+def h_load_false(frame, arg, ip):
+    frame.stack.append(FALSE)
+    return ip
+
+
+def h_load_null(frame, arg, ip):
+    frame.stack.append(NULL)
+    return ip
+
+
+def h_pop(frame, arg, ip):
+    frame.stack.pop()
+    return ip
+
+
+def make_infix_handler(operator):
+    integer_operation = INFIX_OPERATIONS[(operator, Integer, Integer)]
+
+    def handler(frame, arg, ip):
+        stack = frame.stack
+        right = stack.pop()
+        left = stack[-1]
+        if type(left) == Integer and type(right) == Integer:
+            stack[-1] = integer_operation(left, right)
+            return ip
+
+        result = eval_infix_expression(operator, left, right)
+        if is_error(result):
+            return halt(frame, result)
+        stack[-1] = result
+        return ip
+
+    return handler
+
+
+def make_prefix_handler(operator):
+    def handler(frame, arg, ip):
+        stack = frame.stack
+        result = eval_prefix_expression(operator, stack[-1])
+        if is_error(result):
+            return halt(frame, result)
+        stack[-1] = result
+        return ip
+
+    return handler
+
+
+def h_jump(frame, arg, ip):
+    return arg
+
+
+def h_jump_if_false(frame, arg, ip):
+    if is_truthy(frame.stack.pop()):
+        return ip
+    return arg
+
+
+def load_local(frame, arg):
+    binding = frame.bindings[arg]
+    if binding is not None:
+        depth, slot = binding
+        env = frame.env
+        while depth:
+            env = env.outer
+            depth -= 1
+
+        val = env.slots[slot]
+        if val is not None:
+            return val
+
+    return frame.env.get(frame.names[arg])
+
+
+def h_get_local(frame, arg, ip):
+    binding = frame.bindings[arg]
+    if binding is not None and binding[0] == 0:
+        val = frame.env.slots[binding[1]]
+        if val is not None:
+            frame.stack.append(val)
+            return ip
+
+    val = load_local(frame, arg)
+    if val is None:
+        return halt(frame, Error(f"identifier not found: {frame.names[arg]}"))
+    frame.stack.append(val)
+    return ip
+
+
+def h_set_local(frame, arg, ip):
+    binding = frame.bindings[arg]
+    if binding is None:
+        frame.env.set(frame.names[arg], frame.stack.pop())
+    else:
+        frame.env.slots[binding[1]] = frame.stack.pop()
+    return ip
+
+
+def h_make_function(frame, arg, ip):
+    compiled = frame.constants[arg]
+    frame.stack.append(Function(
+        compiled.parameters, compiled.body, frame.env,
+        scope=compiled.scope, bytecode=compiled.bytecode))
+    return ip
+
+
+def pop_call(frame, argc):
+    stack = frame.stack
+    start = len(stack) - argc
+    args = stack[start:]
+    del stack[start:]
+    return stack.pop(), args
+
+
+def h_call(frame, arg, ip):
+    stack = frame.stack
+    function, args = pop_call(frame, arg)
+    if type(function) != Function:
+        return halt(frame, Error(f"not a function: {function.type()}"))
+
+    if jit.ENABLED:
+        result = jit.call(function, args)
+        if result is not None:
+            stack.append(result)
+            return ip
+
+    result = execute(function.bytecode, extend_function_environment(function, args))
+    if is_error(result):
+        return halt(frame, result)
+    stack.append(result)
+    return ip
+
+
+def h_add_local_const(frame, arg, ip):
+    left = load_local(frame, arg)
+    if left is None:
+        return halt(frame, Error(f"identifier not found: {frame.names[arg]}"))
+
+    right = frame.constants[frame.operands[ip]]
+    if type(left) == Integer:
+        frame.stack.append(make_int(left.value + right.value))
+        return ip + 1
+
+    result = eval_infix_expression("+", left, right)
+    if is_error(result):
+        return halt(frame, result)
+    frame.stack.append(result)
+    return ip + 1
+
+
+def h_sub_local_const(frame, arg, ip):
+    left = load_local(frame, arg)
+    if left is None:
+        return halt(frame, Error(f"identifier not found: {frame.names[arg]}"))
+
+    right = frame.constants[frame.operands[ip]]
+    if type(left) == Integer:
+        frame.stack.append(make_int(left.value - right.value))
+        return ip + 1
+
+    result = eval_infix_expression("-", left, right)
+    if is_error(result):
+        return halt(frame, result)
+    frame.stack.append(result)
+    return ip + 1
+
+
+def less_than_jump(frame, left, right, target, ip):
+    if type(left) == Integer and type(right) == Integer:
+        return ip if left.value < right.value else target
+
+    result = eval_infix_expression("<", left, right)
+    if is_error(result):
+        return halt(frame, result)
+    return ip if is_truthy(result) else target
+
+
+def h_lt_local_const_jump_if_false(frame, arg, ip):
+    left = load_local(frame, arg)
+    if left is None:
+        return halt(frame, Error(f"identifier not found: {frame.names[arg]}"))
+
+    operands = frame.operands
+    right = frame.constants[operands[ip]]
+    return less_than_jump(frame, left, right, operands[ip + 1], ip + 2)
+
+
+def h_lt_locals_jump_if_false(frame, arg, ip):
+    names = frame.names
+    left = load_local(frame, arg)
+    if left is None:
+        return halt(frame, Error(f"identifier not found: {names[arg]}"))
+
+    operands = frame.operands
+    right = load_local(frame, operands[ip])
+    if right is None:
+        return halt(frame, Error(f"identifier not found: {names[operands[ip]]}"))
+
+    return less_than_jump(frame, left, right, operands[ip + 1], ip + 2)
+
+
+def h_tail_call(frame, arg, ip):
+    function, args = pop_call(frame, arg)
+    if type(function) != Function:
+        return halt(frame, Error(f"not a function: {function.type()}"))
+
+    frame.result = (function, args)
+    return TAIL
+
+
+def h_return(frame, arg, ip):
+    return halt(frame, frame.stack.pop())
+
+
+HANDLERS = [None] * 256
+HANDLERS[code.LOAD_CONST] = h_load_const
+HANDLERS[code.LOAD_TRUE] = h_load_true
+HANDLERS[code.LOAD_FALSE] = h_load_false
+HANDLERS[code.LOAD_NULL] = h_load_null
+HANDLERS[code.POP] = h_pop
+HANDLERS[code.ADD] = make_infix_handler("+")
+HANDLERS[code.SUB] = make_infix_handler("-")
+HANDLERS[code.MUL] = make_infix_handler("*")
+HANDLERS[code.DIV] = make_infix_handler("/")
+HANDLERS[code.LT] = make_infix_handler("<")
+HANDLERS[code.GT] = make_infix_handler(">")
+HANDLERS[code.EQ] = make_infix_handler("==")
+HANDLERS[code.NEQ] = make_infix_handler("!=")
+HANDLERS[code.NEG] = make_prefix_handler("-")
+HANDLERS[code.BANG] = make_prefix_handler("!")
+HANDLERS[code.JUMP] = h_jump
+HANDLERS[code.JUMP_IF_FALSE] = h_jump_if_false
+HANDLERS[code.GET_LOCAL] = h_get_local
+HANDLERS[code.SET_LOCAL] = h_set_local
+HANDLERS[code.MAKE_FUNCTION] = h_make_function
+HANDLERS[code.CALL] = h_call
+HANDLERS[code.TAIL_CALL] = h_tail_call
+HANDLERS[code.RETURN] = h_return
+HANDLERS[code.ADD_LOCAL_CONST] = h_add_local_const
+HANDLERS[code.SUB_LOCAL_CONST] = h_sub_local_const
+HANDLERS[code.LT_LOCAL_CONST_JUMP_IF_FALSE] = h_lt_local_const_jump_if_false
+HANDLERS[code.LT_LOCALS_JUMP_IF_FALSE] = h_lt_locals_jump_if_false
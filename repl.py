@@ -1,7 +1,8 @@
 import pmonkey.lexer as lexer
 import pmonkey.parser as parser
 import pmonkey.token as token
-import pmonkey.evaluator as evaluator
+import pmonkey.compiler as compiler
+import pmonkey.vm as vm
 from pmonkey.environment import Environment
 
 PROMPT = ">> "
@@ -41,7 +42,7 @@ def start():
             print("\n".join([str(e) for e in psr.errors]))
             continue
 
-        evaluated = evaluator.eval(program, env)
+        evaluated = vm.run(compiler.compile(program, env.scope), env)
         if evaluated != None:
             print(evaluated.inspect())
 
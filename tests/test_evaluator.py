@@ -29,6 +29,10 @@ class TestEvaluator(unittest.TestCase):
             ["3 * 3 * 3 + 10", 37],
             ["3 * (3 * 3) + 10", 37],
             ["(5 + 10 * 2 + 15 / 3) * 2 + -10", 50],
+            ["5 / 2", 2],
+            ["-7 / 2", -3],
+            ["7 / -2", -3],
+            ["let a = -9; a / 4", -2],
         ]
 
         for s, exp_value in tests:
@@ -68,6 +72,11 @@ class TestEvaluator(unittest.TestCase):
             ["(1 < 2) == false", False],
             ["(1 > 2) == true", False],
             ["(1 > 2) == false", True],
+            ["1 == true", False],
+            ["true != 1", True],
+            ["!if(false){ 1 }", True],
+            ["let f = fn(){ 1 }; f == f", True],
+            ["fn(){ 1 } == fn(){ 1 }", False],
         ]
 
         for s, exp_value in tests:
@@ -83,6 +92,7 @@ class TestEvaluator(unittest.TestCase):
             ["if(1 > 2){ 10 }", None],
             ["if(1 > 2){ 10 } else { 20 }", 20],
             ["if(1 < 2){ 10 } else { 20 }", 10],
+            ["if(true){ }", None],
         ]
 
         for s, exp_value in tests:
@@ -136,6 +146,9 @@ class TestEvaluator(unittest.TestCase):
                 "unknown operator: BOOLEAN + BOOLEAN"
             ],
             ["foobar", "identifier not found: foobar"],
+            ["let add = fn(x, y) { x + y }; add(1, -true)", "unknown operator: -BOOLEAN"],
+            ["let add = fn(x, y) { x + y }; add(foo, 1) + 2", "identifier not found: foo"],
+            ["1 + if (true) { return 2; }", "type mismatch: INTEGER + RETURN_VALUE"],
         ]
 
         for test, exp_value in tests:
@@ -194,11 +207,163 @@ class TestEvaluator(unittest.TestCase):
         evaluated = self.eval(s)
         self.assert_integer_object(4, evaluated)
 
-    def eval(self, input_str):
+    def test_scoping(self):
+        tests = [
+            ["let f = fn() { g() }; let g = fn() { 5 }; f()", 5],
+            ["let x = 1; let f = fn() { let y = x; let x = 2; y + x }; f()", 3],
+            [
+                """
+                let x = 1;
+                let outer = fn() {
+                    let inner = fn() { x };
+                    let x = 10;
+                    inner();
+                };
+                outer();
+                """,
+                10
+            ],
+            ["let x = 1; let f = fn() { if (false) { let x = 2; } x }; f()", 1],
+            ["let f = fn(x, y) { let z = x * y; z + x }; f(3, 4)", 15],
+        ]
+
+        for s, exp_value in tests:
+            evaluated = self.eval(s)
+            self.assert_integer_object(exp_value, evaluated)
+
+    def test_tail_calls(self):
+        tests = [
+            ["let count = fn(n) { if (n == 0) { return 0; } count(n - 1) }; count(5000)", 0],
+            ["let sum = fn(n, acc) { if (n == 0) { acc } else { sum(n - 1, acc + n) } }; sum(3000, 0)", 4501500],
+            [
+                """
+                let even = fn(n) { if (n == 0) { return true; } return odd(n - 1); };
+                let odd = fn(n) { if (n == 0) { return false; } even(n - 1) };
+                if (even(4001)) { 1 } else { 0 }
+                """,
+                0
+            ],
+            ["let f = fn(x) { let y = if (x < 1) { return g(x); } else { 2 }; y }; let g = fn(x) { 7 }; f(0)", 7],
+        ]
+
+        for s, exp_value in tests:
+            evaluated = self.eval(s)
+            self.assert_integer_object(exp_value, evaluated)
+
+        evaluated = self.eval("let f = fn() { 5() }; f()")
+        self.assertEqual(Error, type(evaluated))
+        self.assertEqual("not a function: INTEGER", evaluated.message)
+
+    def test_memoized_functions(self):
+        s = """
+            let fib = fn(n) { if (n < 2) { return n; } fib(n - 1) + fib(n - 2) };
+            fib(80);
+        """
+        env = Environment()
+        self.assert_integer_object(23416728348467685, self.eval(s, env))
+        self.assertEqual(81, len(env.get("fib").memo))
+
+        env = Environment()
+        self.eval("let f = fn(n) { if (n < 1) { 0 } else { f(n - 1) + 1 } }; let g = f;", env)
+        self.assert_integer_object(3, self.eval("g(3)", env))
+        self.eval("let f = fn(n) { 100 };", env)
+        self.assert_integer_object(101, self.eval("g(3)", env))
+
+    def test_deeply_nested_expression(self):
+        evaluated = self.eval("1" + " + 1" * 5000)
+        self.assert_integer_object(5001, evaluated)
+
+        evaluated = self.eval("let a = 1; a" + " + a" * 5000)
+        self.assert_integer_object(5001, evaluated)
+
+    def test_constant_folding(self):
+        tests = [
+            ["5 + 5 + 5 + 5 - 10", 10],
+            ["3 * 3 * 3 + 10", 37],
+            ["-50 + 100 - 50", 0],
+            ["(5 + 10 * 2 + 15 / 3) * 2 + -10", 50],
+            ["1 < 2 == true", True],
+            ["!(1 > 2)", True],
+            ["a + 2 * 3", None],
+            ["1 / 0", None],
+            ["-true", None],
+            ["true + false", None],
+        ]
+
+        for s, exp in tests:
+            prg = Parser(Lexer(s)).parse_program()
+            source = str(prg)
+            evaluator.fold_constants(prg)
+            self.assertEqual(source, str(prg))
+
+            constant = prg.statements[0].expression.constant
+            if exp is None:
+                self.assertIsNone(constant, s)
+            else:
+                self.assertEqual(exp, constant.value, s)
+
+        prg = Parser(Lexer("f(1 + 2, a * (3 * 4))")).parse_program()
+        evaluator.fold_constants(prg)
+        arguments = prg.statements[0].expression.arguments
+        self.assertEqual(3, arguments[0].constant.value)
+        self.assertIsNone(arguments[1].constant)
+        self.assertEqual(12, arguments[1].right.constant.value)
+
+        tests = [
+            ["fn(x) { x + 2 * 3 }", "(x+(2*3))"],
+            ["fn(x) { -5 + x }", "((-5)+x)"],
+        ]
+
+        for s, exp in tests:
+            evaluated = self.eval(s)
+            self.assertEqual(exp, str(evaluated.body))
+
+    def test_nary_operations(self):
+        tests = [
+            ["fn(x) { x + x + x }", "((x+x)+x)"],
+            ["fn(x) { x * x * x + x }", "(((x*x)*x)+x)"],
+        ]
+
+        for s, exp in tests:
+            evaluated = self.eval(s)
+            self.assertEqual(exp, str(evaluated.body))
+
+        tests = [
+            ["let a = 2; a + a + a + a", 8],
+            ["let a = 2; a * a * a * a", 16],
+            ["let a = 2; a + a + a - 1 + a", 7],
+            ["let a = 2; a + a * a * a + a", 12],
+            ["let a = 2; let f = fn(x) { x + a + x }; f(3) * f(1) * a", 64],
+        ]
+
+        for s, exp_value in tests:
+            self.assert_integer_object(exp_value, self.eval(s))
+
+        tests = [
+            ["let a = 1; a + a + true", "type mismatch: INTEGER + BOOLEAN"],
+            ["let a = true; a + 1 + foo", "type mismatch: BOOLEAN + INTEGER"],
+            ["let a = 1; a * foo * true", "identifier not found: foo"],
+            ["let a = true; a + a + a", "unknown operator: BOOLEAN + BOOLEAN"],
+        ]
+
+        for s, exp_value in tests:
+            evaluated = self.eval(s)
+            self.assertEqual(Error, type(evaluated))
+            self.assertEqual(exp_value, evaluated.message)
+
+    def test_environment_persists_between_programs(self):
+        env = Environment()
+        self.eval("let a = 5; let double = fn(x) { x * 2 };", env)
+        self.assert_integer_object(10, self.eval("double(a)", env))
+        self.eval("let b = 7;", env)
+        self.assert_integer_object(14, self.eval("double(b)", env))
+
+    def eval(self, input_str, env=None):
         l = Lexer(input_str)
         p = Parser(l)
         prg = p.parse_program()
-        env = Environment()
+        if env is None:
+            env = Environment()
         obj = evaluator.eval(prg, env)
         return obj
 
@@ -0,0 +1,108 @@
+import unittest
+from pmonkey.lexer import Lexer
+from pmonkey.parser import Parser
+from pmonkey.objects import Integer
+from pmonkey.objects import TRUE
+from pmonkey.environment import Environment
+from pmonkey.environment import Scope
+import pmonkey.compiler as compiler
+import pmonkey.jit as jit
+import pmonkey.vm as vm
+
+
+# python -m unittest tests.test_jit
+class TestJit(unittest.TestCase):
+    def test_int_vm(self):
+        tests = [
+            ["fn(x) { x + 2 }", [5], 7],
+            ["fn(x, y) { x * y - 1 }", [6, 7], 41],
+            ["fn(n) { if (n < 2) { return n; } n - 1 }", [1], 1],
+            ["fn(n) { if (n < 2) { return n; } n - 1 }", [7], 6],
+            ["fn(a, b) { if (a < b) { b } else { a } }", [3, 9], 9],
+            ["fn(x) { if (x) { 1 } else { 2 } }", [0], 1],
+            ["fn(x) { -x + 10 }", [4], 6],
+            ["fn(x) { x > 3 }", [4], 1],
+            ["fn(x) { !(x == 3) }", [3], 0],
+            ["fn(x) { !x }", [3], 0],
+            ["let f = fn(n) { if (n < 2) { n } else { f(n - 1) + f(n - 2) } }", [15], 610],
+            ["let f = fn(n, a) { if (n < 1) { a } else { f(n - 1, a + n) } }", [10000, 0], 50005000],
+            ["let f = fn(n) { if (n < 1) { 0 } else { 2 * f(n - 1) + 1 } }", [10], 1023],
+        ]
+
+        for s, args, exp_value in tests:
+            status, value = self.run_int_vm(s, args)
+            self.assertEqual(jit.OK, status, s)
+            self.assertEqual(exp_value, value, s)
+
+    def test_int_vm_bails(self):
+        tests = [
+            ["fn(x) { x * x }", [2 ** 40]],
+            ["let f = fn(n) { if (n < 1) { 0 } else { f(n - 1) + 1 } }", [jit.MAX_FRAMES]],
+        ]
+
+        for s, args in tests:
+            status, _ = self.run_int_vm(s, args)
+            self.assertEqual(jit.BAIL, status, s)
+
+    def test_unsupported_functions(self):
+        tests = [
+            "fn(x) { x + y }",
+            "fn(x) { x / 2 }",
+            "fn(x) { x + true }",
+            "fn(x) { if (x < 1) { true } else { 1 } }",
+            "fn(x) { (x < 1) == 1 }",
+            "fn(x) { let y = x; y }",
+            "fn(x) { x(1) }",
+            "fn(x) { if (x < 1) { 5 } }",
+            "let f = fn(x) { f(x, 1) }",
+            "let f = fn(x) { f + 1 }",
+            "let f = fn(x) { if (x < 1) { true } else { f(x - 1) } }",
+            "let f = fn(x) { f(x) + g(x) }",
+            # 再帰しない関数は整数VMに回さない
+            "fn(x) { x + 2 }",
+        ]
+
+        for s in tests:
+            function = self.function(s)
+            self.assertIs(False, jit.compile_function(function.bytecode, function.parameters), s)
+
+    def test_call(self):
+        s = "let f = fn(n) { if (n < 2) { n } else { f(n - 1) + f(n - 2) } }; let g = f;"
+        env = self.run_vm(s)
+        self.assertEqual(55, jit.call(env.get("f"), [Integer(10)]).value)
+        self.assertIs(None, jit.call(env.get("f"), [TRUE]))
+
+        # f が別の関数に束縛し直されたら、g は自分を呼べない
+        self.run_vm("let f = fn(n) { n };", env)
+        self.assertIs(None, jit.call(env.get("g"), [Integer(10)]))
+
+    @unittest.skipUnless(jit.ENABLED, "numba is not installed")
+    def test_vm_calls_through_jit(self):
+        s = "let fib = fn(n) { if (n < 2) { n } else { fib(n - 1) + fib(n - 2) } }; fib(20)"
+        prg = Parser(Lexer(s)).parse_program()
+        env = Environment()
+        evaluated = vm.run(compiler.compile(prg, env.scope), env)
+        self.assertEqual(Integer, type(evaluated))
+        self.assertEqual(6765, evaluated.value)
+        self.assertIsInstance(env.get("fib").bytecode.int_program, jit.IntProgram)
+
+    def run_int_vm(self, input_str, args):
+        function = self.function(input_str)
+        opcodes, operands, result_kind, _ = jit.translate(
+            function.bytecode, function.parameters)
+        self.assertIsNotNone(result_kind, input_str)
+        return jit.run_int_vm(
+            jit.int_array(opcodes), jit.int_array(operands), jit.int_array(args))
+
+    def function(self, input_str):
+        l = Lexer(input_str)
+        p = Parser(l)
+        prg = p.parse_program()
+        constants = compiler.compile(prg, Scope()).constants
+        return next(c for c in constants if type(c) == compiler.CompiledFunction)
+
+    def run_vm(self, input_str, env=None):
+        env = env or Environment()
+        prg = Parser(Lexer(input_str)).parse_program()
+        vm.run(compiler.compile(prg, env.scope), env)
+        return env
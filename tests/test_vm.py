@@ -0,0 +1,249 @@
+import unittest
+from pmonkey.lexer import Lexer
+from pmonkey.parser import Parser
+from pmonkey.objects import Integer
+from pmonkey.objects import Boolean
+from pmonkey.objects import Null
+from pmonkey.objects import Error
+from pmonkey.objects import Function
+from pmonkey.environment import Environment
+from pmonkey.environment import Scope
+import pmonkey.code as code
+import pmonkey.compiler as compiler
+import pmonkey.vm as vm
+
+
+# python -m unittest tests.test_vm
+class TestVM(unittest.TestCase):
+    def test_integer_arithmetic(self):
+        tests = [
+            ["5", 5],
+            ["-10", -10],
+            ["5 + 5 + 5 + 5 - 10", 10],
+            ["2 * 2 * 2 * 2 * 2", 32],
+            ["-50 + 100 - 50", 0],
+            ["20 + 2 * -10", 0],
+            ["50 / 2 * 2 + 10", 60],
+            ["3 * (3 * 3) + 10", 37],
+            ["(5 + 10 * 2 + 15 / 3) * 2 + -10", 50],
+            ["5 / 2", 2],
+            ["-7 / 2", -3],
+        ]
+
+        for s, exp_value in tests:
+            self.assert_integer_object(exp_value, self.run_vm(s))
+
+    def test_boolean_expressions(self):
+        tests = [
+            ["true", True],
+            ["!5", False],
+            ["!!true", True],
+            ["1 < 2", True],
+            ["1 > 2", False],
+            ["1 == 1", True],
+            ["1 != 1", False],
+            ["true != false", True],
+            ["(1 < 2) == true", True],
+            ["(1 > 2) == true", False],
+        ]
+
+        for s, exp_value in tests:
+            self.assert_boolean_object(exp_value, self.run_vm(s))
+
+    def test_conditionals(self):
+        tests = [
+            ["if(true){ 10 }", 10],
+            ["if(false){ 10 }", None],
+            ["if(1){ 10 }", 10],
+            ["if(1 > 2){ 10 } else { 20 }", 20],
+            ["if(1 < 2){ 10 } else { 20 }", 10],
+        ]
+
+        for s, exp_value in tests:
+            evaluated = self.run_vm(s)
+            if exp_value:
+                self.assert_integer_object(exp_value, evaluated)
+            else:
+                self.assertEqual(Null, type(evaluated))
+
+    def test_return_statements(self):
+        tests = [
+            ["return 10; 9;", 10],
+            ["9; return 2 * 5; 9;", 10],
+            [
+                """
+                if(10 > 1){
+                    if(10 > 1){
+                        return 10;
+                    }
+                    return 1
+                }
+                """,
+                10
+            ],
+        ]
+
+        for s, exp_value in tests:
+            self.assert_integer_object(exp_value, self.run_vm(s))
+
+    def test_return_in_expression_position(self):
+        tests = [
+            ["let f = fn(x){ x }; f(if (true) { return 1; }) + 5", 1],
+            ["1 + if (true) { return 2; }", 2],
+            ["let g = fn() { let a = if (true) { return 3; }; 4 }; g()", 3],
+            ["if (if (true) { return 5; }) { 6 }", 5],
+        ]
+
+        for s, exp_value in tests:
+            self.assert_integer_object(exp_value, self.run_vm(s))
+
+    def test_folded_functions_keep_their_source(self):
+        tests = [
+            ["fn(x) { x + 2 * 3 }(1)", 7, "(x+(2*3))"],
+            ["fn(x) { -5 + x }(1)", -4, "((-5)+x)"],
+        ]
+
+        for s, exp_value, exp_body in tests:
+            prg = Parser(Lexer(s)).parse_program()
+            env = Environment()
+            bytecode = compiler.compile(prg, env.scope)
+            self.assert_integer_object(exp_value, vm.run(bytecode, env))
+            self.assertEqual(exp_body, str(prg.statements[0].expression.function.body))
+
+    def test_error_handling(self):
+        tests = [
+            ["5 + true; 5", "type mismatch: INTEGER + BOOLEAN"],
+            ["-true", "unknown operator: -BOOLEAN"],
+            ["5; true + false; 5", "unknown operator: BOOLEAN + BOOLEAN"],
+            ["if (10 > 1) { return true + false; } 1",
+             "unknown operator: BOOLEAN + BOOLEAN"],
+            ["foobar", "identifier not found: foobar"],
+            ["let f = fn(x) { x + y }; f(1); 5", "identifier not found: y"],
+        ]
+
+        for s, exp_value in tests:
+            evaluated = self.run_vm(s)
+            self.assertEqual(Error, type(evaluated))
+            self.assertEqual(exp_value, evaluated.message)
+
+    def test_let_statements(self):
+        self.assertIsNone(self.run_vm("let a = 5;"))
+        self.assert_integer_object(
+            15, self.run_vm("let a = 5; let b = a; let c = a + b + 5; c;"))
+
+    def test_functions(self):
+        tests = [
+            ["let identity = fn(x) { return x; }; identity(5)", 5],
+            ["let add = fn(x, y) { x + y; }; add(5 + 5, add(5, 5));", 20],
+            ["fn(x) { x; }(5)", 5],
+            ["let new_adder = fn(x){ fn(y){ x + y } }; new_adder(2)(2)", 4],
+            [
+                """
+                let fib = fn(n) { if (n < 2) { return n; } fib(n - 1) + fib(n - 2) };
+                fib(15);
+                """,
+                610
+            ],
+        ]
+
+        for s, exp_value in tests:
+            self.assert_integer_object(exp_value, self.run_vm(s))
+
+        evaluated = self.run_vm("fn(x) { x + 2; };")
+        self.assertEqual(Function, type(evaluated))
+        self.assertEqual("(x+2)", str(evaluated.body))
+
+    def test_superinstructions(self):
+        tests = [
+            ["let x = 5; x + 2", 7],
+            ["let x = 5; x - 1", 4],
+            ["let x = 5; x + -1", 4],
+            ["let a = 1; let b = 2; if (a < b) { 10 } else { 20 }", 10],
+            ["let a = 3; if (a < 2) { 10 } else { 20 }", 20],
+        ]
+
+        for s, exp_value in tests:
+            self.assert_integer_object(exp_value, self.run_vm(s))
+
+        bytecode = self.compile("fn(n) { if (n < 2) { return n; } n - 1 }", Scope())
+        function = bytecode.constants[0]
+        self.assertIn(code.LT_LOCAL_CONST_JUMP_IF_FALSE, function.bytecode.opcodes)
+        self.assertIn(code.SUB_LOCAL_CONST, function.bytecode.opcodes)
+
+        evaluated = self.run_vm("let x = true; x + 1")
+        self.assertEqual(Error, type(evaluated))
+        self.assertEqual("type mismatch: BOOLEAN + INTEGER", evaluated.message)
+
+    def test_tail_calls(self):
+        tests = [
+            ["let count = fn(n) { if (n == 0) { return 0; } count(n - 1) }; count(5000)", 0],
+            ["let sum = fn(n, acc) { if (n == 0) { acc } else { sum(n - 1, acc + n) } }; sum(3000, 0)", 4501500],
+        ]
+
+        for s, exp_value in tests:
+            self.assert_integer_object(exp_value, self.run_vm(s))
+
+    def test_environment_persists_between_runs(self):
+        env = Environment()
+        self.run_vm("let a = 5;", env)
+        self.assert_integer_object(10, self.run_vm("a * 2", env))
+        self.run_vm("let double = fn(x) { x * 2 };", env)
+        self.assert_integer_object(10, self.run_vm("double(a)", env))
+        self.run_vm("let a = 7;", env)
+        self.assert_integer_object(14, self.run_vm("double(a)", env))
+
+    def test_scoping(self):
+        tests = [
+            ["let f = fn() { g() }; let g = fn() { 5 }; f()", 5],
+            ["let x = 1; let f = fn() { let y = x; let x = 2; y + x }; f()", 3],
+            [
+                """
+                let x = 1;
+                let outer = fn() {
+                    let inner = fn() { x };
+                    let x = 10;
+                    inner();
+                };
+                outer();
+                """,
+                10
+            ],
+            ["let x = 1; let f = fn() { if (false) { let x = 2; } x }; f()", 1],
+            ["let f = fn(x, y) { let z = x * y; z + x }; f(3, 4)", 15],
+            ["let new_adder = fn(x) { fn(y) { x + y } }; new_adder(2)(3)", 5],
+        ]
+
+        for s, exp_value in tests:
+            self.assert_integer_object(exp_value, self.run_vm(s))
+
+    def test_locals_are_resolved_to_slots(self):
+        env = Environment()
+        bytecode = self.compile("let a = 1; let f = fn(x) { x + a }; f(a)", env.scope)
+        names = env.scope.names
+        self.assertEqual(["a", "f"], bytecode.names)
+        self.assertEqual([(0, names["a"]), (0, names["f"])], bytecode.bindings)
+
+        function = bytecode.constants[1].bytecode
+        self.assertEqual(["x", "a"], function.names)
+        self.assertEqual([(0, 0), (1, names["a"])], function.bindings)
+        self.assert_integer_object(2, vm.run(bytecode, env))
+
+    def compile(self, input_str, scope):
+        l = Lexer(input_str)
+        p = Parser(l)
+        prg = p.parse_program()
+        return compiler.compile(prg, scope)
+
+    def run_vm(self, input_str, env=None):
+        env = env or Environment()
+        return vm.run(self.compile(input_str, env.scope), env)
+
+    def assert_boolean_object(self, exp_value, obj):
+        self.assertEqual(Boolean, type(obj))
+        self.assertEqual(exp_value, obj.value)
+
+    def assert_integer_object(self, exp_value, obj):
+        if type(obj) == Error:
+            print(obj.inspect())
+        self.assertEqual(Integer, type(obj))
+        self.assertEqual(exp_value, obj.value)